@@ -1,32 +1,75 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from app.schemas.flight_schema import FlightCreate, FlightUpdate
 from app.services.flight_service import FlightService
+from app.services.idempotency_service import (
+    IdempotencyStore,
+    get_idempotency_store,
+    request_fingerprint,
+)
 from app.repositories.flight_repository import FlightRepository
+from app.repositories.idempotency_repository import IdempotencyRepository
 from app.database import get_db
-from fastapi import Depends
+from fastapi import Depends, Header
+from typing import Callable, Optional
 
 router = APIRouter()
 
 
-def create_service(db):
-    flight_repo = FlightRepository(db)
+def create_service(db, autocommit: bool = True):
+    flight_repo = FlightRepository(db, autocommit=autocommit)
     service = FlightService(flight_repo)
     return service
 
 
-@router.post("/create/", status_code=status.HTTP_201_CREATED)
-def create_flight(flight: FlightCreate, db=Depends(get_db)):
+def run_idempotent(
+    request: Request,
+    response: Response,
+    db,
+    store: IdempotencyStore,
+    idempotency_key: Optional[str],
+    payload: Optional[dict],
+    handler: Callable[[], dict],
+) -> dict:
+    """Answer repeated Idempotency-Key requests from the stored response."""
+    fingerprint = request_fingerprint(request.method, request.url.path, payload)
     try:
-        service = create_service(db)
-        result = service.create_flight(flight.dict())
-        return {
-            "status": "success",
-            "code": 201,
-            "message": "Flight created successfully",
-            "data": result,
-        }
+        result, replayed = store.execute(
+            IdempotencyRepository(db), idempotency_key, fingerprint, handler
+        )
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+@router.post("/create/", status_code=status.HTTP_201_CREATED)
+def create_flight(
+    flight: FlightCreate,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db=Depends(get_db),
+    store: IdempotencyStore = Depends(get_idempotency_store),
+):
+    def handler():
+        try:
+            service = create_service(db, autocommit=not idempotency_key)
+            result = service.create_flight(flight.dict())
+            return {
+                "status": "success",
+                "code": 201,
+                "message": "Flight created successfully",
+                "data": result,
+            }
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return run_idempotent(
+        request, response, db, store, idempotency_key, flight.dict(), handler
+    )
 
 
 @router.get("/")
@@ -37,45 +80,79 @@ def list_flights(
     sort_order: str = "asc",
     origin: str = None,
     destination: str = None,
+    fields: str = None,
     db=Depends(get_db),
 ):
     service = create_service(db)
 
-    result = service.get_flights(page, limit, sort_by, sort_order, origin, destination)
+    try:
+        result = service.get_flights(
+            page, limit, sort_by, sort_order, origin, destination, fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {"status": "success", "code": 200, "data": result}
 
 
 @router.get("/{flight_number}")
-def get_flight(flight_number: str, db=Depends(get_db)):
+def get_flight(flight_number: str, fields: str = None, db=Depends(get_db)):
     service = create_service(db)
 
-    result = service.get_flight_by_number(flight_number)
+    try:
+        result = service.get_flight_by_number(flight_number, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not result:
         raise HTTPException(status_code=404, detail="Flight not found")
     return {"status": "success", "code": 200, "data": result}
 
 
 @router.put("/{flight_number}")
-def update_flight(flight_number: str, flight: FlightUpdate, db=Depends(get_db)):
-    service = create_service(db)
+def update_flight(
+    flight_number: str,
+    flight: FlightUpdate,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db=Depends(get_db),
+    store: IdempotencyStore = Depends(get_idempotency_store),
+):
+    update_data = flight.dict(exclude_unset=True)
+
+    def handler():
+        service = create_service(db, autocommit=not idempotency_key)
+
+        result = service.update_flight(flight_number, dict(update_data))
+        return {
+            "status": "success",
+            "code": 200,
+            "message": "Flight updated successfully",
+            "data": result,
+        }
 
-    result = service.update_flight(flight_number, flight.dict(exclude_unset=True))
-    return {
-        "status": "success",
-        "code": 200,
-        "message": "Flight updated successfully",
-        "data": result,
-    }
+    return run_idempotent(
+        request, response, db, store, idempotency_key, update_data, handler
+    )
 
 
 @router.patch("/{flight_number}/deactivate")
-def deactivate_flight(flight_number: str, db=Depends(get_db)):
-    service = create_service(db)
+def deactivate_flight(
+    flight_number: str,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db=Depends(get_db),
+    store: IdempotencyStore = Depends(get_idempotency_store),
+):
+    def handler():
+        service = create_service(db, autocommit=not idempotency_key)
+
+        result = service.deactivate_flight(flight_number)
+        return {
+            "status": "success",
+            "code": 204,
+            "message": "Flight deactivated successfully",
+            "data": result,
+        }
 
-    result = service.deactivate_flight(flight_number)
-    return {
-        "status": "success",
-        "code": 204,
-        "message": "Flight deactivated successfully",
-        "data": result,
-    }
+    return run_idempotent(request, response, db, store, idempotency_key, None, handler)
@@ -1,18 +1,77 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
 from app.api.routers.flights_router import router as flights_router
+from app.config import Settings
+from app.database import create_db_engine, create_session_factory
+from app.services.idempotency_service import IdempotencyStore
+from app.warmup import warm_up
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Sepehran Airline API",
-    description="Flight management system with CRUD operations and soft deletion.",
-    version="1.0.0",
-)
 
-# Include flight routes
-app.include_router(flights_router, prefix="/flights", tags=["Flights"])
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the FastAPI app; database warm-up runs in the lifespan hook."""
+    settings = settings or Settings.from_env()
+    engine = create_db_engine(settings)
 
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Warm up in the background so /ready can report progress
+        app.state.ready = False
+        warm_up_task = asyncio.create_task(
+            asyncio.to_thread(
+                warm_up,
+                engine,
+                app.state.SessionLocal,
+                app.state.idempotency_store,
+                settings,
+            )
+        )
+        warm_up_task.add_done_callback(lambda _: setattr(app.state, "ready", True))
+        yield
+        await warm_up_task
+        engine.dispose()
 
-@app.get("/")
-def root():
-    """Root endpoint for health check."""
-    return {"message": "Sepehran Airline API is running 🚀"}
+    # Initialize FastAPI app
+    app = FastAPI(
+        title="Sepehran Airline API",
+        description="Flight management system with CRUD operations and soft deletion.",
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    app.state.settings = settings
+    app.state.engine = engine
+    app.state.SessionLocal = create_session_factory(engine)
+    app.state.ready = False
+
+    app.state.idempotency_store = IdempotencyStore(
+        settings.idempotency_ttl_seconds,
+        settings.idempotency_cache_size,
+        settings.idempotency_lock_timeout_seconds,
+        settings.idempotency_abandon_after_seconds,
+    )
+
+    # Compress responses larger than the threshold for clients sending
+    # "Accept-Encoding: gzip" (large flight lists compress very well)
+    app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
+    # Include flight routes
+    app.include_router(flights_router, prefix="/flights", tags=["Flights"])
+
+    @app.get("/")
+    def root():
+        """Root endpoint for health check."""
+        return {"message": "Sepehran Airline API is running 🚀"}
+
+    @app.get("/ready")
+    def ready(request: Request):
+        """Readiness endpoint; not ready until startup warm-up has finished."""
+        if not request.app.state.ready:
+            raise HTTPException(status_code=503, detail="Warm-up in progress")
+        return {"status": "ready"}
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime, Text
+from ..database import Base
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    idempotency_key = Column(String(255), primary_key=True, nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    reservation_token = Column(String(36), nullable=False)
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, index=True)
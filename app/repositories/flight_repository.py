@@ -2,16 +2,39 @@ from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy import create_engine, text
 from typing import List, Optional
 import uuid
+from app.models.flight_model import Flight
+
+# Columns a client may request through a sparse fieldset
+FLIGHT_COLUMNS = tuple(Flight.__table__.columns.keys())
 
 
 class FlightRepository:
     """
     Repository class for managing Flight data.
     All database interactions are done via raw SQL queries.
+    With autocommit=False writes are left for the caller to commit.
     """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, autocommit: bool = True):
         self.db = db
+        self.autocommit = autocommit
+
+    def _commit(self) -> None:
+        if self.autocommit:
+            self.db.commit()
+
+    @staticmethod
+    def _columns(fields: Optional[List[str]] = None) -> str:
+        """
+        Build the SELECT column list; fall back to every column when
+        no sparse fieldset is requested.
+        """
+        if not fields:
+            return "*"
+        unknown = [f for f in fields if f not in FLIGHT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return ", ".join(fields)
 
     # ================= Create =================
     def create(self, flight_data: dict) -> dict:
@@ -26,7 +49,7 @@ class FlightRepository:
         VALUES (:id, :flight_number, :origin, :destination, :departure_time, :arrival_time, 1)
         """
         self.db.execute(text(query), flight_data)
-        self.db.commit()
+        self._commit()
         return flight_data
 
     # ================= Read / List =================
@@ -40,8 +63,9 @@ class FlightRepository:
         destination: Optional[str] = None,
         is_active: Optional[bool] = True,
         sort: bool = False,
+        fields: Optional[List[str]] = None,
     ) -> List[dict]:
-        base_query = "SELECT * FROM flights WHERE 1=1"
+        base_query = f"SELECT {self._columns(fields)} FROM flights WHERE 1=1"
         params = {}
 
         if origin:
@@ -65,8 +89,13 @@ class FlightRepository:
         return [dict(row) for row in result]
 
     # ================= Get by Flight Number =================
-    def get_by_number(self, flight_number: str) -> Optional[dict]:
-        query = "SELECT * FROM flights WHERE flight_number = :flight_number"
+    def get_by_number(
+        self, flight_number: str, fields: Optional[List[str]] = None
+    ) -> Optional[dict]:
+        query = (
+            f"SELECT {self._columns(fields)} FROM flights "
+            "WHERE flight_number = :flight_number"
+        )
         result = (
             self.db.execute(text(query), {"flight_number": flight_number})
             .mappings()
@@ -83,7 +112,7 @@ class FlightRepository:
         update_data["flight_number"] = flight_number
         query = f"UPDATE flights SET {set_clause} WHERE flight_number = :flight_number"
         self.db.execute(text(query), update_data)
-        self.db.commit()
+        self._commit()
         return self.get_by_number(flight_number)
 
     # ================= Deactivate =================
@@ -94,7 +123,7 @@ class FlightRepository:
         WHERE flight_number = :flight_number AND is_active = 1
         """
         self.db.execute(text(query), {"flight_number": flight_number})
-        self.db.commit()
+        self._commit()
         return self.get_by_number(flight_number)
 
     # ================= "Delete" =================
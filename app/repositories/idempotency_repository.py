@@ -0,0 +1,144 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import DateTime, text
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from typing import List, Optional
+
+
+class IdempotencyRepository:
+    """
+    Repository class for stored idempotent responses.
+    All database interactions are done via raw SQL queries.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ================= Get =================
+    def get(self, key: str, not_before: datetime) -> Optional[dict]:
+        """
+        Return the row for a key unless it is older than not_before.
+        The response is None while the owning request is still running.
+        """
+        query = """
+        SELECT idempotency_key, fingerprint, response, created_at FROM idempotency_keys
+        WHERE idempotency_key = :idempotency_key AND created_at >= :not_before
+        """
+        result = (
+            self.db.execute(
+                text(query).columns(created_at=DateTime),
+                {"idempotency_key": key, "not_before": not_before},
+            )
+            .mappings()
+            .first()
+        )
+        return dict(result) if result else None
+
+    # ================= Recent =================
+    def get_recent(self, not_before: datetime, limit: int) -> List[dict]:
+        """
+        Return up to limit unexpired responses, newest first.
+        """
+        query = """
+        SELECT idempotency_key, fingerprint, response, created_at FROM idempotency_keys
+        WHERE created_at >= :not_before AND response IS NOT NULL
+        ORDER BY created_at DESC
+        LIMIT :limit
+        """
+        result = (
+            self.db.execute(
+                text(query).columns(created_at=DateTime),
+                {"not_before": not_before, "limit": limit},
+            )
+            .mappings()
+            .all()
+        )
+        return [dict(row) for row in result]
+
+    # ================= Reserve =================
+    def reserve(
+        self, record: dict, not_before: datetime, stale_before: datetime
+    ) -> bool:
+        """
+        Claim a key by inserting an in-progress row (response NULL) under its
+        primary key, tagged with the caller's reservation_token. An expired
+        row or a reservation abandoned before stale_before for this key is
+        dropped first. Returns False when another request already holds it.
+        """
+        query = """
+        DELETE FROM idempotency_keys
+        WHERE idempotency_key = :idempotency_key
+            AND (created_at < :not_before
+                OR (response IS NULL AND created_at < :stale_before))
+        """
+        self.db.execute(
+            text(query),
+            {
+                "idempotency_key": record["idempotency_key"],
+                "not_before": not_before,
+                "stale_before": stale_before,
+            },
+        )
+        query = """
+        INSERT INTO idempotency_keys
+            (idempotency_key, fingerprint, reservation_token, response, created_at)
+        VALUES (:idempotency_key, :fingerprint, :reservation_token, NULL, :created_at)
+        """
+        try:
+            self.db.execute(text(query), record)
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            return False
+        return True
+
+    # ================= Purge =================
+    def purge_expired(self, not_before: datetime) -> int:
+        """
+        Delete every row older than not_before and return how many went.
+        """
+        result = self.db.execute(
+            text("DELETE FROM idempotency_keys WHERE created_at < :not_before"),
+            {"not_before": not_before},
+        )
+        self.db.commit()
+        return result.rowcount
+
+    # ================= Complete =================
+    def complete(self, key: str, token: str, response: str) -> bool:
+        """
+        Store the response of a key still reserved under token. This commits
+        the session, so writes made by the request are committed together
+        with its response. When the reservation was taken over, everything
+        is rolled back instead and False is returned.
+        """
+        query = """
+        UPDATE idempotency_keys SET response = :response
+        WHERE idempotency_key = :idempotency_key
+            AND reservation_token = :reservation_token AND response IS NULL
+        """
+        result = self.db.execute(
+            text(query),
+            {"idempotency_key": key, "reservation_token": token, "response": response},
+        )
+        if result.rowcount != 1:
+            self.db.rollback()
+            return False
+        self.db.commit()
+        return True
+
+    # ================= Release =================
+    def release(self, key: str, token: str) -> None:
+        """
+        Drop an unfinished reservation held under token so the request can
+        be retried. A reservation taken over by another request is kept.
+        """
+        query = """
+        DELETE FROM idempotency_keys
+        WHERE idempotency_key = :idempotency_key
+            AND reservation_token = :reservation_token AND response IS NULL
+        """
+        self.db.execute(
+            text(query), {"idempotency_key": key, "reservation_token": token}
+        )
+        self.db.commit()
@@ -8,6 +8,17 @@ class FlightService:
     def __init__(self, repository: FlightRepository):
         self.repo = repository
 
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+        """
+        Turn a comma separated ``fields`` query value into a column list.
+        Duplicates are dropped while keeping the requested order.
+        """
+        if not fields:
+            return None
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        return list(dict.fromkeys(names)) or None
+
     def create_flight(self, flight_data: dict) -> dict:
         # Prevent duplicate flight_number
         existing = self.repo.get_by_number(flight_data["flight_number"])
@@ -24,6 +35,7 @@ class FlightService:
         origin: Optional[str] = None,
         destination: Optional[str] = None,
         is_active: Optional[bool] = True,
+        fields: Optional[str] = None,
     ) -> List[dict]:
         """
         in real task we use condition in this file
@@ -40,10 +52,13 @@ class FlightService:
             destination=destination,
             is_active=is_active,
             sort=True,
+            fields=self.parse_fields(fields),
         )
 
-    def get_flight_by_number(self, flight_number: str) -> Optional[dict]:
-        return self.repo.get_by_number(flight_number)
+    def get_flight_by_number(
+        self, flight_number: str, fields: Optional[str] = None
+    ) -> Optional[dict]:
+        return self.repo.get_by_number(flight_number, self.parse_fields(fields))
 
     def update_flight(self, flight_number: str, update_data: dict) -> dict:
         return self.repo.update(flight_number, update_data)
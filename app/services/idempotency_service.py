@@ -0,0 +1,254 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from app.repositories.idempotency_repository import IdempotencyRepository
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(method: str, path: str, payload: Optional[dict]) -> str:
+    """Hash of the request a key was first used with, to detect key reuse."""
+    raw = json.dumps(
+        {"method": method, "path": path, "payload": jsonable_encoder(payload)},
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Replays stored responses for repeated Idempotency-Key values.
+
+    The first request for a key reserves it with an in-progress row in the
+    idempotency_keys table, so the primary key decides the owner across
+    workers. Other requests with that key poll the row until the owner
+    stores its response and then replay it; within one process they queue
+    on a per-key lock instead. Only successful responses are stored, so a
+    failed request releases its key and can be retried. Waiters give up
+    after lock_timeout_seconds; a reservation older than
+    abandon_after_seconds (which must be longer) is treated as abandoned and
+    can be taken over. Each reservation carries its own token, so a request
+    whose reservation was taken over rolls its write back instead of
+    committing it. Recent responses are also kept in a bounded in-memory
+    LRU cache. Expired rows are purged at startup and once every
+    purge_every stored responses, not on every request.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 86400,
+        max_entries: int = 1024,
+        lock_timeout_seconds: float = 30,
+        abandon_after_seconds: float = 300,
+        poll_interval: float = 0.05,
+        purge_every: int = 1000,
+    ):
+        if abandon_after_seconds <= lock_timeout_seconds:
+            raise ValueError(
+                "abandon_after_seconds must be longer than lock_timeout_seconds"
+            )
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.lock_timeout = timedelta(seconds=lock_timeout_seconds)
+        self.abandon_after = timedelta(seconds=abandon_after_seconds)
+        self.poll_interval = poll_interval
+        self.purge_every = purge_every
+        self._stored = 0
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._locks: dict = {}
+        self._guard = threading.Lock()
+
+    # ================= Per-key locking =================
+    def _acquire(self, key: str) -> threading.Lock:
+        with self._guard:
+            lock, waiters = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, waiters + 1)
+        lock.acquire()
+        return lock
+
+    def _release(self, key: str, lock: threading.Lock) -> None:
+        lock.release()
+        with self._guard:
+            _, waiters = self._locks[key]
+            if waiters == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, waiters - 1)
+
+    # ================= In-memory cache =================
+    def _cache_get(self, key: str, not_before: datetime) -> Optional[dict]:
+        with self._guard:
+            record = self._cache.get(key)
+            if record is None:
+                return None
+            if record["created_at"] < not_before:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return record
+
+    def _cache_put(self, record: dict) -> None:
+        with self._guard:
+            self._cache[record["idempotency_key"]] = record
+            self._cache.move_to_end(record["idempotency_key"])
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def preload(self, repository: IdempotencyRepository) -> int:
+        """Fill the in-memory cache with the most recent stored responses."""
+        not_before = datetime.utcnow() - self.ttl
+        records = repository.get_recent(not_before, self.max_entries)
+        for record in reversed(records):
+            self._cache_put(record)
+        return len(records)
+
+    def purge(self, repository: IdempotencyRepository) -> int:
+        """Delete stored responses older than the TTL."""
+        return repository.purge_expired(datetime.utcnow() - self.ttl)
+
+    def _count_stored(self) -> bool:
+        """Count a stored response; True once every purge_every responses."""
+        with self._guard:
+            self._stored += 1
+            return self._stored % self.purge_every == 0
+
+    def clear(self) -> None:
+        with self._guard:
+            self._cache.clear()
+
+    # ================= Execute =================
+    @staticmethod
+    def _replay(record: dict, fingerprint: str) -> dict:
+        if record["fingerprint"] != fingerprint:
+            raise ValueError(
+                f"Idempotency-Key {record['idempotency_key']} was already used "
+                "for a different request"
+            )
+        return json.loads(record["response"])
+
+    def _reserve_or_wait(
+        self,
+        repository: IdempotencyRepository,
+        key: str,
+        fingerprint: str,
+        token: str,
+    ) -> Optional[dict]:
+        """
+        Reserve the key under token and return None, or wait for the request
+        holding it and return its completed record.
+        Raises TimeoutError when the holder does not finish within lock_timeout.
+        """
+        deadline = time.monotonic() + self.lock_timeout.total_seconds()
+        while True:
+            now = datetime.utcnow()
+            reserved = repository.reserve(
+                {
+                    "idempotency_key": key,
+                    "fingerprint": fingerprint,
+                    "reservation_token": token,
+                    "created_at": now,
+                },
+                now - self.ttl,
+                now - self.abandon_after,
+            )
+            if reserved:
+                return None
+
+            # Poll with a plain SELECT; only try to reserve again once the
+            # row is gone, expired or abandoned
+            while True:
+                # End the read transaction so each poll sees fresh data
+                repository.db.rollback()
+                now = datetime.utcnow()
+                record = repository.get(key, now - self.ttl)
+                if record is None or (
+                    record["response"] is None
+                    and record["created_at"] < now - self.abandon_after
+                ):
+                    break
+                if record["fingerprint"] != fingerprint:
+                    raise ValueError(
+                        f"Idempotency-Key {key} was already used "
+                        "for a different request"
+                    )
+                if record["response"] is not None:
+                    return record
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"A request with Idempotency-Key {key} is still in progress"
+                    )
+                time.sleep(self.poll_interval)
+
+    def execute(
+        self,
+        repository: IdempotencyRepository,
+        key: Optional[str],
+        fingerprint: str,
+        handler: Callable[[], dict],
+    ) -> Tuple[dict, bool]:
+        """
+        Run handler once per key and return (response, replayed).
+
+        The handler's writes must not be committed by the handler itself:
+        they are committed in one transaction with the stored response, and
+        rolled back (releasing the key) if the handler or that commit fails.
+        Raises ValueError when the key was already used for a different
+        request, and TimeoutError when another request still holds the key or
+        took it over while the handler was running.
+        """
+        if not key:
+            return handler(), False
+
+        lock = self._acquire(key)
+        try:
+            token = str(uuid.uuid4())
+            record = self._cache_get(key, datetime.utcnow() - self.ttl)
+            if record is None:
+                record = self._reserve_or_wait(repository, key, fingerprint, token)
+            if record is not None:
+                response = self._replay(record, fingerprint)
+                self._cache_put(record)
+                return response, True
+
+            try:
+                response = jsonable_encoder(handler())
+                completed = repository.complete(key, token, json.dumps(response))
+            except Exception:
+                repository.db.rollback()
+                repository.release(key, token)
+                raise
+            if not completed:
+                raise TimeoutError(
+                    f"The reservation for Idempotency-Key {key} expired before "
+                    "the request finished; its changes were rolled back"
+                )
+
+            self._cache_put(
+                {
+                    "idempotency_key": key,
+                    "fingerprint": fingerprint,
+                    "response": json.dumps(response),
+                    "created_at": datetime.utcnow(),
+                }
+            )
+            if self._count_stored():
+                # The response is already committed, so never fail the request
+                try:
+                    self.purge(repository)
+                except Exception:
+                    logger.exception("Purging expired idempotent responses failed")
+            return response, False
+        finally:
+            self._release(key, lock)
+
+
+def get_idempotency_store(request: Request) -> IdempotencyStore:
+    return request.app.state.idempotency_store
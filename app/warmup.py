@@ -0,0 +1,83 @@
+import logging
+from datetime import datetime
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from app.config import Settings
+from app.repositories.flight_repository import FlightRepository
+from app.repositories.idempotency_repository import IdempotencyRepository
+from app.services.flight_service import FlightService
+from app.services.idempotency_service import IdempotencyStore
+
+logger = logging.getLogger(__name__)
+
+
+def open_pool_connections(engine: Engine, count: int) -> None:
+    """Check out count connections at once so the pool holds them open."""
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def warm_statements(session_factory: sessionmaker) -> None:
+    """
+    Run the read queries issued by the default endpoints once, so their
+    text() statements are compiled and cached on the engine.
+    """
+    db = session_factory()
+    try:
+        repo = FlightRepository(db)
+        FlightService(repo).get_flights()
+        repo.get_by_number("")
+        IdempotencyRepository(db).get("", datetime.utcnow())
+    finally:
+        db.rollback()
+        db.close()
+
+
+def preload_caches(session_factory: sessionmaker, store: IdempotencyStore) -> None:
+    db = session_factory()
+    try:
+        loaded = store.preload(IdempotencyRepository(db))
+        logger.info("Preloaded %d idempotent responses", loaded)
+    finally:
+        db.close()
+
+
+def purge_expired(session_factory: sessionmaker, store: IdempotencyStore) -> None:
+    db = session_factory()
+    try:
+        purged = store.purge(IdempotencyRepository(db))
+        logger.info("Purged %d expired idempotent responses", purged)
+    finally:
+        db.close()
+
+
+def warm_up(
+    engine: Engine,
+    session_factory: sessionmaker,
+    store: IdempotencyStore,
+    settings: Settings,
+):
+    """
+    Run every configured warm-up step. Failures are logged but never stop
+    the app: warm-up only makes the first requests faster.
+    """
+    steps = []
+    if settings.warmup_connections > 0:
+        count = min(settings.warmup_connections, settings.pool_size)
+        steps.append(("connections", lambda: open_pool_connections(engine, count)))
+    if settings.warmup_statements:
+        steps.append(("statements", lambda: warm_statements(session_factory)))
+    steps.append(("purge", lambda: purge_expired(session_factory, store)))
+    if settings.preload_caches:
+        steps.append(("caches", lambda: preload_caches(session_factory, store)))
+
+    for name, step in steps:
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %s failed", name)
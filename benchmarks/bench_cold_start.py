@@ -0,0 +1,135 @@
+"""
+Benchmark for startup warm-up: time-to-first-request and the latency of the
+first 100 requests after start, with and without warm-up.
+
+Every run starts a fresh interpreter so nothing is shared between runs. A
+run builds the app with create_app(), enters its lifespan, waits for /ready
+when warm-up is enabled (as a load balancer would) and then sends the first
+request followed by 100 more. Uses a throwaway SQLite database by default;
+set BENCH_DATABASE_URL to point it at MySQL, where connects cost far more.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cold_start
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROWS = 200
+REQUESTS = 100
+RUNS = 5
+DATABASE_FILE = "bench_cold_start.db"
+DATABASE_URL = os.getenv("BENCH_DATABASE_URL", f"sqlite:///./{DATABASE_FILE}")
+
+
+def seed():
+    from sqlalchemy import create_engine, text
+    from app.database import Base
+    from app.models import flight_model, idempotency_model  # noqa: F401
+
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2025, 11, 10, 0, 0)
+    rows = [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "flight_number": f"IR{i:04d}",
+            "origin": "Tehran",
+            "destination": "Mashhad",
+            "departure_time": start + timedelta(minutes=i),
+            "arrival_time": start + timedelta(minutes=i + 90),
+        }
+        for i in range(ROWS)
+    ]
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO flights (id, flight_number, origin, destination, "
+                "departure_time, arrival_time, is_active) VALUES (:id, "
+                ":flight_number, :origin, :destination, :departure_time, "
+                ":arrival_time, 1)"
+            ),
+            rows,
+        )
+    engine.dispose()
+
+
+def run_once(warm: bool) -> dict:
+    """Measure one cold start in the current (fresh) interpreter."""
+    started = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from app.config import Settings
+    from app.main import create_app
+
+    settings = Settings(
+        database_url=DATABASE_URL,
+        database_echo=False,
+        warmup_connections=5 if warm else 0,
+        warmup_statements=warm,
+    )
+    with TestClient(create_app(settings)) as client:
+        if warm:
+            while client.get("/ready").status_code != 200:
+                time.sleep(0.001)
+        first_sent = time.perf_counter()
+        response = client.get("/flights/")
+        assert response.status_code == 200
+        first = time.perf_counter()
+
+        latencies = []
+        for i in range(REQUESTS):
+            url = "/flights/" if i % 2 else f"/flights/IR{i % ROWS:04d}"
+            sent = time.perf_counter()
+            assert client.get(url).status_code == 200
+            latencies.append(time.perf_counter() - sent)
+
+    latencies.sort()
+    return {
+        "ttfr_ms": (first - started) * 1000,
+        "first_ms": (first - first_sent) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "total_ms": sum(latencies) * 1000,
+    }
+
+
+def main():
+    seed()
+    print(
+        f"{'variant':<16}{'ttfr ms':>10}{'first req ms':>14}{'p50 ms':>10}"
+        f"{'max ms':>10}{f'{REQUESTS} req ms':>14}"
+    )
+    for name, warm in (("no warm-up", False), ("warm-up", True)):
+        runs = []
+        for _ in range(RUNS):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_cold_start", "--run"]
+                + (["--warm"] if warm else []),
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        median = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(
+            f"{name:<16}{median['ttfr_ms']:>10.1f}{median['first_ms']:>14.2f}"
+            f"{median['p50_ms']:>10.2f}{median['max_ms']:>10.2f}"
+            f"{median['total_ms']:>14.1f}"
+        )
+
+    if os.path.exists(DATABASE_FILE):
+        os.remove(DATABASE_FILE)
+
+
+if __name__ == "__main__":
+    if "--run" in sys.argv:
+        print(json.dumps(run_once("--warm" in sys.argv)))
+    else:
+        main()
@@ -0,0 +1,112 @@
+"""
+Benchmark for sparse fieldsets and gzip compression on the flight list.
+
+Seeds 1000 flights into a throwaway SQLite database and requests a
+1000-row page with and without ``fields=`` and ``Accept-Encoding: gzip``,
+reporting bytes on the wire and the median latency of each variant.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sparse_fields
+"""
+
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import get_db
+from app.main import app
+from app.models.flight_model import Base
+
+ROWS = 1000
+ROUNDS = 30
+DATABASE_FILE = "bench_sparse_fields.db"
+
+engine = create_engine(
+    f"sqlite:///./{DATABASE_FILE}", connect_args={"check_same_thread": False}
+)
+BenchSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    db = BenchSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def seed():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2025, 11, 10, 0, 0)
+    rows = [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "flight_number": f"IR{i:04d}",
+            "origin": "Tehran",
+            "destination": "Mashhad",
+            "departure_time": start + timedelta(minutes=i),
+            "arrival_time": start + timedelta(minutes=i + 90),
+        }
+        for i in range(ROWS)
+    ]
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO flights (id, flight_number, origin, destination, "
+                "departure_time, arrival_time, is_active) VALUES (:id, "
+                ":flight_number, :origin, :destination, :departure_time, "
+                ":arrival_time, 1)"
+            ),
+            rows,
+        )
+
+
+def measure(client, url, encoding):
+    headers = {"Accept-Encoding": encoding}
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append(time.perf_counter() - started)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == ROWS
+    wire = int(response.headers["content-length"])
+    return wire, statistics.median(timings) * 1000
+
+
+def main():
+    app.dependency_overrides[get_db] = override_get_db
+    seed()
+    client = TestClient(app)
+
+    full = f"/flights/?limit={ROWS}"
+    sparse = f"{full}&fields=flight_number,destination,departure_time"
+    variants = [
+        ("all columns, identity", full, "identity"),
+        ("all columns, gzip", full, "gzip"),
+        ("sparse fields, identity", sparse, "identity"),
+        ("sparse fields, gzip", sparse, "gzip"),
+    ]
+
+    baseline = None
+    print(f"{'variant':<26}{'bytes':>10}{'ratio':>8}{'median ms':>12}")
+    for name, url, encoding in variants:
+        wire, latency = measure(client, url, encoding)
+        baseline = baseline or (wire, latency)
+        print(f"{name:<26}{wire:>10}{wire / baseline[0]:>8.2f}{latency:>12.2f}")
+
+    app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
+    if os.path.exists(DATABASE_FILE):
+        os.remove(DATABASE_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from app.main import app
+from app.main import app, create_app
+from app.config import Settings
+from app.repositories.idempotency_repository import IdempotencyRepository
+from app.services.flight_service import FlightService
+from app.services.idempotency_service import IdempotencyStore
 from app.models.flight_model import Base
+from app.models.idempotency_model import IdempotencyRecord  # noqa: F401
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import os
+import threading
+import time
 import pytest
 from app.api.routers.flights_router import (
     get_db,
@@ -37,6 +46,7 @@ def setup_database():
     """Create a clean database schema before each test and remove it afterward."""
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    app.state.idempotency_store.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -207,6 +217,428 @@ def test_invalid_flight_creation(client):
     assert "detail" in data
 
 
+# ======================================================
+# SCENARIO 7: Request a sparse fieldset of flights
+# ======================================================
+def test_list_flights_sparse_fields(client):
+    client.post(
+        "/flights/create/",
+        json={
+            "flight_number": "IR300",
+            "origin": "Tehran",
+            "destination": "Kish",
+            "departure_time": "2025-11-14T08:00:00",
+            "arrival_time": "2025-11-14T10:00:00",
+        },
+    )
+
+    response = client.get("/flights/?fields=flight_number,destination,departure_time")
+    assert response.status_code == 200
+    flights = response.json()["data"]
+    assert len(flights) == 1
+    assert set(flights[0]) == {"flight_number", "destination", "departure_time"}
+    assert flights[0]["destination"] == "Kish"
+
+    check = client.get("/flights/IR300?fields=origin")
+    assert check.status_code == 200
+    assert check.json()["data"] == {"origin": "Tehran"}
+
+
+# ======================================================
+# SCENARIO 8: Reject unknown fields in a sparse fieldset
+# ======================================================
+def test_sparse_fields_unknown_column(client):
+    response = client.get("/flights/?fields=flight_number,password")
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+
+# ======================================================
+# SCENARIO 9: Compress large flight lists
+# ======================================================
+def test_list_flights_gzip(client):
+    for i in range(30):
+        client.post(
+            "/flights/create/",
+            json={
+                "flight_number": f"IR4{i:02d}",
+                "origin": "Tehran",
+                "destination": "Mashhad",
+                "departure_time": "2025-11-15T08:00:00",
+                "arrival_time": "2025-11-15T10:00:00",
+            },
+        )
+
+    response = client.get("/flights/?limit=30", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["data"]) == 30
+
+
+# ======================================================
+# SCENARIO 10: Replay a retried creation by Idempotency-Key
+# ======================================================
+def test_create_flight_idempotent_replay(client):
+    flight_data = {
+        "flight_number": "IR500",
+        "origin": "Tehran",
+        "destination": "Isfahan",
+        "departure_time": "2025-11-16T08:00:00",
+        "arrival_time": "2025-11-16T09:00:00",
+    }
+    headers = {"Idempotency-Key": "create-IR500"}
+    first = client.post("/flights/create/", json=flight_data, headers=headers)
+    assert first.status_code == 201
+    assert "idempotent-replayed" not in first.headers
+
+    retry = client.post("/flights/create/", json=flight_data, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+
+    # Stored responses survive a restart (empty in-memory cache)
+    app.state.idempotency_store.clear()
+    retry = client.post("/flights/create/", json=flight_data, headers=headers)
+    assert retry.status_code == 201
+    assert retry.json()["data"]["id"] == first.json()["data"]["id"]
+
+    # Without a key the duplicate check still applies
+    duplicate = client.post("/flights/create/", json=flight_data)
+    assert duplicate.status_code == 400
+
+
+# ======================================================
+# SCENARIO 11: Reject an Idempotency-Key reused for another request
+# ======================================================
+def test_idempotency_key_reused_for_other_request(client):
+    flight_data = {
+        "flight_number": "IR501",
+        "origin": "Tehran",
+        "destination": "Yazd",
+        "departure_time": "2025-11-16T08:00:00",
+        "arrival_time": "2025-11-16T09:00:00",
+    }
+    headers = {"Idempotency-Key": "key-IR501"}
+    client.post("/flights/create/", json=flight_data, headers=headers)
+
+    response = client.patch("/flights/IR501/deactivate", headers=headers)
+    assert response.status_code == 422
+
+
+# ======================================================
+# SCENARIO 12: Concurrent requests with one Idempotency-Key
+# ======================================================
+def test_concurrent_idempotent_creation(client):
+    flight_data = {
+        "flight_number": "IR502",
+        "origin": "Tehran",
+        "destination": "Tabriz",
+        "departure_time": "2025-11-16T08:00:00",
+        "arrival_time": "2025-11-16T09:00:00",
+    }
+    headers = {"Idempotency-Key": "create-IR502"}
+
+    def send(_):
+        return client.post("/flights/create/", json=flight_data, headers=headers)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(send, range(4)))
+
+    assert [r.status_code for r in responses] == [201] * 4
+    assert len({r.json()["data"]["id"] for r in responses}) == 1
+    replayed = [r for r in responses if "idempotent-replayed" in r.headers]
+    assert len(replayed) == 3
+
+
+# ======================================================
+# SCENARIO 13: Reject an Idempotency-Key longer than the stored column
+# ======================================================
+def test_idempotency_key_too_long(client):
+    response = client.post(
+        "/flights/create/",
+        json={
+            "flight_number": "IR507",
+            "origin": "Tehran",
+            "destination": "Sari",
+            "departure_time": "2025-11-16T08:00:00",
+            "arrival_time": "2025-11-16T09:00:00",
+        },
+        headers={"Idempotency-Key": "k" * 256},
+    )
+    assert response.status_code == 422
+    assert client.get("/flights/IR507").status_code == 404
+
+    response = client.patch(
+        "/flights/IR507/deactivate", headers={"Idempotency-Key": "k" * 256}
+    )
+    assert response.status_code == 422
+
+
+# ======================================================
+# SCENARIO 14: Another worker waits on the Idempotency-Key holder
+# ======================================================
+def test_idempotency_key_waits_across_workers(monkeypatch):
+    settings = Settings(database_url=SQLALCHEMY_DATABASE_URL, database_echo=False)
+    # Two apps with their own engines and stores stand in for two workers
+    worker_a = TestClient(create_app(settings))
+    worker_b = TestClient(create_app(settings))
+
+    entered = threading.Event()
+    release = threading.Event()
+    calls = []
+    original = FlightService.create_flight
+
+    def slow_create_flight(self, flight_data):
+        calls.append(flight_data["flight_number"])
+        entered.set()
+        release.wait(timeout=5)
+        return original(self, flight_data)
+
+    monkeypatch.setattr(FlightService, "create_flight", slow_create_flight)
+    reserve_calls = []
+    original_reserve = IdempotencyRepository.reserve
+
+    def counting_reserve(self, *args):
+        reserve_calls.append(args[0]["idempotency_key"])
+        return original_reserve(self, *args)
+
+    monkeypatch.setattr(IdempotencyRepository, "reserve", counting_reserve)
+    flight_data = {
+        "flight_number": "IR503",
+        "origin": "Tehran",
+        "destination": "Rasht",
+        "departure_time": "2025-11-16T08:00:00",
+        "arrival_time": "2025-11-16T09:00:00",
+    }
+    headers = {"Idempotency-Key": "create-IR503"}
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(
+            worker_a.post, "/flights/create/", json=flight_data, headers=headers
+        )
+        assert entered.wait(timeout=5)
+        second = pool.submit(
+            worker_b.post, "/flights/create/", json=flight_data, headers=headers
+        )
+        time.sleep(0.2)
+        assert not second.done()
+        release.set()
+        first, second = first.result(), second.result()
+
+    assert calls == ["IR503"]
+    # The waiting worker polls with SELECTs instead of retrying the reservation
+    assert reserve_calls == ["create-IR503", "create-IR503"]
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+
+
+# ======================================================
+# SCENARIO 15: Roll back a slow request whose key was taken over
+# ======================================================
+def test_idempotency_takeover_during_slow_request(monkeypatch):
+    settings = Settings(database_url=SQLALCHEMY_DATABASE_URL, database_echo=False)
+    app_a, app_b = create_app(settings), create_app(settings)
+    for worker in (app_a, app_b):
+        worker.state.idempotency_store = IdempotencyStore(
+            lock_timeout_seconds=0.2, abandon_after_seconds=0.5, poll_interval=0.01
+        )
+    worker_a, worker_b = TestClient(app_a), TestClient(app_b)
+    worker_a.post(
+        "/flights/create/",
+        json={
+            "flight_number": "IR505",
+            "origin": "Tehran",
+            "destination": "Bushehr",
+            "departure_time": "2025-11-16T08:00:00",
+            "arrival_time": "2025-11-16T09:00:00",
+        },
+    )
+
+    entered = threading.Event()
+    release = threading.Event()
+    calls = []
+    original = FlightService.deactivate_flight
+
+    def slow_deactivate_flight(self, flight_number):
+        calls.append(flight_number)
+        if len(calls) == 1:
+            entered.set()
+            release.wait(timeout=5)
+        return original(self, flight_number)
+
+    monkeypatch.setattr(FlightService, "deactivate_flight", slow_deactivate_flight)
+    url = "/flights/IR505/deactivate"
+    headers = {"Idempotency-Key": "deactivate-IR505"}
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        slow = pool.submit(worker_a.patch, url, headers=headers)
+        assert entered.wait(timeout=5)
+
+        # A waiter gives up before the reservation counts as abandoned
+        waiter = worker_b.patch(url, headers=headers)
+        assert waiter.status_code == 409
+
+        time.sleep(0.5)
+        takeover = worker_b.patch(url, headers=headers)
+        assert takeover.status_code == 200
+        assert "idempotent-replayed" not in takeover.headers
+
+        release.set()
+        slow = slow.result()
+
+    # The slow request lost its reservation, so its write was rolled back
+    assert slow.status_code == 409
+    assert len(calls) == 2
+
+    replay = worker_a.patch(url, headers=headers)
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert replay.json() == takeover.json()
+
+
+# ======================================================
+# SCENARIO 16: Roll back the write when its response cannot be stored
+# ======================================================
+def test_idempotent_write_rolled_back_when_save_fails(monkeypatch):
+    original = IdempotencyRepository.complete
+    failures = []
+
+    def failing_complete(self, key, token, response):
+        if not failures:
+            failures.append(key)
+            raise RuntimeError("idempotency store unavailable")
+        return original(self, key, token, response)
+
+    monkeypatch.setattr(IdempotencyRepository, "complete", failing_complete)
+    failing_client = TestClient(app, raise_server_exceptions=False)
+    flight_data = {
+        "flight_number": "IR504",
+        "origin": "Tehran",
+        "destination": "Ahvaz",
+        "departure_time": "2025-11-16T08:00:00",
+        "arrival_time": "2025-11-16T09:00:00",
+    }
+    headers = {"Idempotency-Key": "create-IR504"}
+
+    response = failing_client.post(
+        "/flights/create/", json=flight_data, headers=headers
+    )
+    assert response.status_code == 500
+    assert failing_client.get("/flights/IR504").status_code == 404
+
+    retry = failing_client.post("/flights/create/", json=flight_data, headers=headers)
+    assert retry.status_code == 201
+    assert "idempotent-replayed" not in retry.headers
+
+
+# ======================================================
+# SCENARIO 17: Purge expired keys outside the request path
+# ======================================================
+def test_expired_idempotency_keys_purged_off_request_path(client):
+    db = TestingSessionLocal()
+    expired_at = datetime.utcnow() - timedelta(days=2)
+    db.execute(
+        text(
+            "INSERT INTO idempotency_keys (idempotency_key, fingerprint, "
+            "reservation_token, response, created_at) VALUES "
+            "('old-key', 'f', 't', '{}', :created_at)"
+        ),
+        {"created_at": expired_at},
+    )
+    db.commit()
+
+    def count_old_keys():
+        return db.execute(
+            text(
+                "SELECT COUNT(*) FROM idempotency_keys WHERE idempotency_key = 'old-key'"
+            )
+        ).scalar()
+
+    client.post(
+        "/flights/create/",
+        json={
+            "flight_number": "IR506",
+            "origin": "Tehran",
+            "destination": "Zahedan",
+            "departure_time": "2025-11-16T08:00:00",
+            "arrival_time": "2025-11-16T09:00:00",
+        },
+        headers={"Idempotency-Key": "create-IR506"},
+    )
+    assert count_old_keys() == 1
+
+    assert app.state.idempotency_store.purge(IdempotencyRepository(db)) == 1
+    assert count_old_keys() == 0
+    db.close()
+
+
+# ======================================================
+# SCENARIO 18: Report not ready while startup warm-up runs
+# ======================================================
+def test_not_ready_during_warm_up(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_warm_up(*args):
+        started.set()
+        release.wait(timeout=5)
+
+    monkeypatch.setattr("app.main.warm_up", blocking_warm_up)
+    settings = Settings(database_url=SQLALCHEMY_DATABASE_URL, database_echo=False)
+    with TestClient(create_app(settings)) as warm_client:
+        assert started.wait(timeout=5)
+        response = warm_client.get("/ready")
+        assert response.status_code == 503
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while response.status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+            response = warm_client.get("/ready")
+        assert response.status_code == 200
+
+
+# ======================================================
+# SCENARIO 19: Become ready once startup warm-up finishes
+# ======================================================
+def test_ready_after_warm_up():
+    settings = Settings(
+        database_url=SQLALCHEMY_DATABASE_URL,
+        database_echo=False,
+        warmup_connections=2,
+        preload_caches=True,
+    )
+    with TestClient(create_app(settings)) as warm_client:
+        deadline = time.monotonic() + 5
+        response = warm_client.get("/ready")
+        while response.status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+            response = warm_client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+
+        # The factory app serves flights from its own engine
+        assert warm_client.get("/flights/").status_code == 200
+
+
+# ======================================================
+# SCENARIO 20: Keep idempotency settings scoped to each app
+# ======================================================
+def test_idempotency_store_scoped_per_app():
+    ttl = app.state.idempotency_store.ttl
+    other = create_app(
+        Settings(
+            database_url=SQLALCHEMY_DATABASE_URL,
+            database_echo=False,
+            idempotency_ttl_seconds=60,
+            idempotency_cache_size=2,
+        )
+    )
+    assert other.state.idempotency_store is not app.state.idempotency_store
+    assert other.state.idempotency_store.max_entries == 2
+    assert app.state.idempotency_store.ttl == ttl
+
+
 @pytest.fixture(scope="session", autouse=True)
 def cleanup_test_db():
     yield